@@ -13,20 +13,44 @@ import platform
 import re
 import os
 import shutil
+import select
 import ctypes
 import ctypes.util
+import functools
+import collections
+import logging
+from dataclasses import dataclass
+from typing import Optional
 from ctypes import byref, c_char_p, c_float, c_uint32, c_void_p
 
 
+log = logging.getLogger("sleepalert.battery")
+log.setLevel(logging.INFO)
+
 _CFSTRING_ENCODING_UTF8 = 0x08000100
+_CFNUMBER_SINT32_TYPE = 3
+_AC_POWER_STATE = "AC Power"
+_INTERNAL_BATTERY_TYPE = "InternalBattery"
+_POWER_SOURCE_NOTIFICATION = b"com.apple.system.powersources.source"
+DEFAULT_CHECK_INTERVAL = 10
+_MIN_FLASH_DURATION = 1 / 60
+_BRIGHT_RE = re.compile(rb'brightness[^0-9]*([0-9]*\.?[0-9]+)', re.IGNORECASE)
 TEST_BRIGHTNESS_CUTOFF_ENV = "SLEEPALERT_TEST_BRIGHTNESS_CUTOFF"
 TEST_BATTERY_LEVEL_ENV = "SLEEPALERT_TEST_BATTERY_LEVEL"
 TEST_PLUGGED_ENV = "SLEEPALERT_TEST_PLUGGED_IN"
 
 
-def get_test_brightness_cutoff():
-    """Read optional test cutoff from env var (0.0 to 1.0)."""
-    raw = os.getenv(TEST_BRIGHTNESS_CUTOFF_ENV)
+@dataclass(frozen=True)
+class TestConfig:
+    """SLEEPALERT_* test overrides, parsed once at startup."""
+
+    brightness_cutoff: Optional[float] = None
+    battery_level: Optional[int] = None
+    plugged: bool = False
+
+
+def _parse_test_brightness_cutoff(raw):
+    """Parse optional test cutoff (0.0 to 1.0)."""
     if raw is None:
         return None
     try:
@@ -35,32 +59,43 @@ def get_test_brightness_cutoff():
             return value
     except ValueError:
         pass
-    print(f"Invalid {TEST_BRIGHTNESS_CUTOFF_ENV} value '{raw}', expected 0.0-1.0")
+    log.warning("Invalid %s value '%s', expected 0.0-1.0", TEST_BRIGHTNESS_CUTOFF_ENV, raw)
     return None
 
 
-def get_test_battery_override():
-    """Read optional simulated battery settings from env vars."""
-    raw_level = os.getenv(TEST_BATTERY_LEVEL_ENV)
+def _parse_test_battery_level(raw_level):
+    """Parse optional simulated battery level (0 to 100)."""
     if raw_level is None:
         return None
-
     try:
         level = int(raw_level)
         if not 0 <= level <= 100:
             raise ValueError
     except ValueError:
-        print(f"Invalid {TEST_BATTERY_LEVEL_ENV} value '{raw_level}', expected integer 0-100")
+        log.warning("Invalid %s value '%s', expected integer 0-100", TEST_BATTERY_LEVEL_ENV, raw_level)
         return None
+    return level
 
+
+def load_test_config():
+    """Read optional test settings from SLEEPALERT_* env vars."""
+    environ = os.environ
     # Default test behavior: act as unplugged so low-battery effects can be tested while charging.
-    plugged_raw = os.getenv(TEST_PLUGGED_ENV, "0").strip().lower()
-    plugged = plugged_raw in {"1", "true", "yes", "on"}
-    return level, plugged
+    plugged_raw = environ.get(TEST_PLUGGED_ENV, "0").strip().lower()
+    return TestConfig(
+        brightness_cutoff=_parse_test_brightness_cutoff(environ.get(TEST_BRIGHTNESS_CUTOFF_ENV)),
+        battery_level=_parse_test_battery_level(environ.get(TEST_BATTERY_LEVEL_ENV)),
+        plugged=plugged_raw in {"1", "true", "yes", "on"},
+    )
+
+
+def _clamp01(value):
+    """Clamp a brightness value to the 0.0-1.0 range."""
+    return 0.0 if value < 0.0 else (1.0 if value > 1.0 else value)
 
 
 def _load_display_libraries():
-    """Load macOS frameworks needed for brightness control."""
+    """Load macOS frameworks needed for brightness control and power source queries."""
     try:
         core_graphics = ctypes.CDLL(ctypes.util.find_library("CoreGraphics"))
         iokit = ctypes.CDLL(ctypes.util.find_library("IOKit"))
@@ -72,11 +107,29 @@ def _load_display_libraries():
 
         core_foundation.CFStringCreateWithCString.argtypes = [c_void_p, c_char_p, c_uint32]
         core_foundation.CFStringCreateWithCString.restype = c_void_p
+        core_foundation.CFStringGetCString.argtypes = [c_void_p, c_char_p, ctypes.c_long, c_uint32]
+        core_foundation.CFStringGetCString.restype = ctypes.c_bool
+        core_foundation.CFNumberGetValue.argtypes = [c_void_p, ctypes.c_long, c_void_p]
+        core_foundation.CFNumberGetValue.restype = ctypes.c_bool
+        core_foundation.CFDictionaryGetValue.argtypes = [c_void_p, c_void_p]
+        core_foundation.CFDictionaryGetValue.restype = c_void_p
+        core_foundation.CFArrayGetCount.argtypes = [c_void_p]
+        core_foundation.CFArrayGetCount.restype = ctypes.c_long
+        core_foundation.CFArrayGetValueAtIndex.argtypes = [c_void_p, ctypes.c_long]
+        core_foundation.CFArrayGetValueAtIndex.restype = c_void_p
+        core_foundation.CFRelease.argtypes = [c_void_p]
+        core_foundation.CFRelease.restype = None
 
         iokit.IODisplayGetFloatParameter.argtypes = [c_uint32, c_uint32, c_void_p, ctypes.POINTER(c_float)]
         iokit.IODisplayGetFloatParameter.restype = ctypes.c_int
         iokit.IODisplaySetFloatParameter.argtypes = [c_uint32, c_uint32, c_void_p, c_float]
         iokit.IODisplaySetFloatParameter.restype = ctypes.c_int
+        iokit.IOPSCopyPowerSourcesInfo.argtypes = []
+        iokit.IOPSCopyPowerSourcesInfo.restype = c_void_p
+        iokit.IOPSCopyPowerSourcesList.argtypes = [c_void_p]
+        iokit.IOPSCopyPowerSourcesList.restype = c_void_p
+        iokit.IOPSGetPowerSourceDescription.argtypes = [c_void_p, c_void_p]
+        iokit.IOPSGetPowerSourceDescription.restype = c_void_p
 
         return core_graphics, iokit, core_foundation
     except Exception:
@@ -98,8 +151,9 @@ def _load_display_services():
         return None
 
 
+@functools.cache
 def _find_brightness_cli():
-    """Find brightness CLI in PATH or common install locations."""
+    """Find brightness CLI in PATH or common install locations, resolved on first use."""
     cli = shutil.which("brightness")
     if cli:
         return cli
@@ -109,33 +163,109 @@ def _find_brightness_cli():
     return None
 
 
+def _create_cfstring(text):
+    """Create a CFStringRef for a constant key, or None without CoreFoundation."""
+    if _CORE_FOUNDATION is None:
+        return None
+    return _CORE_FOUNDATION.CFStringCreateWithCString(None, text, _CFSTRING_ENCODING_UTF8)
+
+
+def _register_power_source_notifications():
+    """Return a descriptor that becomes readable on AC plug/unplug, or None."""
+    try:
+        libsystem = ctypes.CDLL(ctypes.util.find_library("System"))
+        register = libsystem.notify_register_file_descriptor
+        register.argtypes = [c_char_p, ctypes.POINTER(ctypes.c_int), ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
+        register.restype = c_uint32
+
+        notify_fd = ctypes.c_int(-1)
+        token = ctypes.c_int(0)
+        if register(_POWER_SOURCE_NOTIFICATION, byref(notify_fd), 0, byref(token)) != 0:
+            return None
+        return notify_fd.value
+    except Exception:
+        return None
+
+
 _CORE_GRAPHICS, _IOKIT, _CORE_FOUNDATION = _load_display_libraries()
 _DISPLAY_SERVICES = _load_display_services()
-_BRIGHTNESS_CLI = _find_brightness_cli()
-_BRIGHTNESS_KEY = None
+_BRIGHTNESS_KEY = _create_cfstring(b"brightness")
+_POWER_SOURCE_KEYS = tuple(
+    _create_cfstring(name)
+    for name in (b"Type", b"Current Capacity", b"Max Capacity", b"Power Source State")
+)
+_POWER_SOURCE_FD = _register_power_source_notifications()
+# (display_id, service) for the main display the service was looked up for.
+_DISPLAY_SERVICE_CACHE = None
+# Pre-bound brightness entry points and a shared c_float reused for every
+# get/set, so the hot path skips attribute lookups and per-call allocations.
+_DS_GET_BRIGHTNESS = getattr(_DISPLAY_SERVICES, "DisplayServicesGetBrightness", None)
+_DS_SET_BRIGHTNESS = getattr(_DISPLAY_SERVICES, "DisplayServicesSetBrightness", None)
+_IO_GET_FLOAT = getattr(_IOKIT, "IODisplayGetFloatParameter", None)
+_IO_SET_FLOAT = getattr(_IOKIT, "IODisplaySetFloatParameter", None)
+_FLOAT_BUF = c_float(0.0)
 _LAST_BRIGHTNESS = None
-_WARNED_BRIGHTNESS_CONTROL = False
-_WARNED_BRIGHTNESS_CLI = False
-_LOGGED_BRIGHTNESS_BACKEND = None
+# Bit 0: warned that brightness control is unavailable; bit 1: warned that the
+# brightness CLI failed; bits 2-3: brightness backend that last succeeded;
+# bits 4-5: warned that a DisplayServices/IOKit set failed over to the next backend.
+_STATE = 0
+_WARNED_UNAVAILABLE = 1 << 0
+_WARNED_CLI = 1 << 1
+_BACKEND_MASK = 0b11 << 2
+_BACKEND_DISPLAY_SERVICES = 1 << 2
+_BACKEND_IOKIT = 2 << 2
+_BACKEND_CLI = 3 << 2
+_WARNED_DISPLAY_SERVICES_SET = 1 << 4
+_WARNED_IOKIT_SET = 1 << 5
+_UNAVAILABLE_WARNING = (
+    "Warning: brightness control unavailable on this display/session; "
+    "alerts will run but brightness changes may not apply."
+)
+_CLI_FAILED_WARNING = "Warning: brightness CLI failed ({})."
+_NATIVE_SET_FAILED_WARNING = "Warning: {} returned status {} setting brightness; trying the next backend."
+
+
+def _cf_number_to_int(ref):
+    """Convert a CFNumberRef to int, or None when missing."""
+    if not ref:
+        return None
+    value = ctypes.c_int32(0)
+    if not _CORE_FOUNDATION.CFNumberGetValue(ref, _CFNUMBER_SINT32_TYPE, byref(value)):
+        return None
+    return value.value
 
 
-def _get_brightness_key():
-    """Create CFStringRef for 'brightness' once."""
-    global _BRIGHTNESS_KEY
-    if _BRIGHTNESS_KEY is not None or _CORE_FOUNDATION is None:
-        return _BRIGHTNESS_KEY
-    _BRIGHTNESS_KEY = _CORE_FOUNDATION.CFStringCreateWithCString(None, b"brightness", _CFSTRING_ENCODING_UTF8)
-    return _BRIGHTNESS_KEY
+def _cf_string_to_str(ref):
+    """Convert a CFStringRef to str, or None when missing."""
+    if not ref:
+        return None
+    buffer = ctypes.create_string_buffer(64)
+    if not _CORE_FOUNDATION.CFStringGetCString(ref, buffer, len(buffer), _CFSTRING_ENCODING_UTF8):
+        return None
+    return buffer.value.decode("utf-8", errors="replace")
 
 
 def _get_display_service():
-    """Return the IOKit service handle for the main display."""
+    """Return the IOKit service handle for the main display, cached per display id."""
+    global _DISPLAY_SERVICE_CACHE
     if _CORE_GRAPHICS is None:
         return 0
     display_id = _CORE_GRAPHICS.CGMainDisplayID()
     if display_id == 0:
         return 0
-    return _CORE_GRAPHICS.CGDisplayIOServicePort(display_id)
+    # Re-query the service only when the main display changed since the last lookup.
+    if _DISPLAY_SERVICE_CACHE is not None and _DISPLAY_SERVICE_CACHE[0] == display_id:
+        return _DISPLAY_SERVICE_CACHE[1]
+    service = _CORE_GRAPHICS.CGDisplayIOServicePort(display_id)
+    if service != 0:
+        _DISPLAY_SERVICE_CACHE = (display_id, service)
+    return service
+
+
+def _invalidate_display_service():
+    """Forget the cached display service so the next lookup re-queries CoreGraphics."""
+    global _DISPLAY_SERVICE_CACHE
+    _DISPLAY_SERVICE_CACHE = None
 
 
 def _get_main_display_id():
@@ -145,254 +275,420 @@ def _get_main_display_id():
     return _CORE_GRAPHICS.CGMainDisplayID()
 
 
-def _warn_brightness_unavailable():
-    """Log a single warning when no brightness backend is available."""
-    global _WARNED_BRIGHTNESS_CONTROL
-    if _WARNED_BRIGHTNESS_CONTROL:
+def _log_once(flag_bit, message):
+    """Log message only the first time flag_bit is set in the state bitmask."""
+    global _STATE
+    if _STATE & flag_bit:
         return
-    print(
-        "Warning: brightness control unavailable on this display/session; "
-        "alerts will run but brightness changes may not apply."
-    )
-    _WARNED_BRIGHTNESS_CONTROL = True
+    _STATE |= flag_bit
+    log.warning(message)
 
 
-def _warn_brightness_cli(message):
-    """Log a single warning when brightness CLI exists but fails."""
-    global _WARNED_BRIGHTNESS_CLI
-    if _WARNED_BRIGHTNESS_CLI:
+def _log_brightness_backend(flag):
+    """Log backend selection when it changes."""
+    global _STATE
+    if _STATE & _BACKEND_MASK == flag:
         return
-    print(f"Warning: brightness CLI failed ({message}); falling back to API backends.")
-    _WARNED_BRIGHTNESS_CLI = True
-
-
-def _log_brightness_backend(name):
-    """Log backend selection once."""
-    global _LOGGED_BRIGHTNESS_BACKEND
-    if _LOGGED_BRIGHTNESS_BACKEND == name:
-        return
-    print(f"Brightness backend: {name}")
-    _LOGGED_BRIGHTNESS_BACKEND = name
+    _STATE = (_STATE & ~_BACKEND_MASK) | flag
+    log.info("Brightness backend: %s", _active_backend().describe())
 
 
 def _get_brightness_via_cli():
     """Get brightness via external brightness utility."""
-    if _BRIGHTNESS_CLI is None:
+    cli = _find_brightness_cli()
+    if cli is None:
         return None
     try:
-        result = subprocess.run(
-            [_BRIGHTNESS_CLI, "-l"],
-            capture_output=True,
-            text=True,
+        output = subprocess.check_output(
+            [cli, "-l"],
+            stderr=subprocess.STDOUT,
             timeout=2,
-            check=False,
+        ).strip()
+    except subprocess.CalledProcessError as e:
+        output = (e.output or b"").strip()
+        _log_once(
+            _WARNED_CLI,
+            _CLI_FAILED_WARNING.format(output.decode(errors="replace") or f"exit code {e.returncode}"),
         )
-    except Exception as e:
-        _warn_brightness_cli(str(e))
         return None
-
-    output = f"{result.stdout}\n{result.stderr}".strip()
-    if result.returncode != 0:
-        _warn_brightness_cli(output or f"exit code {result.returncode}")
+    except Exception as e:
+        _log_once(_WARNED_CLI, _CLI_FAILED_WARNING.format(e))
         return None
 
-    matches = re.findall(r'brightness[^0-9]*([0-9]*\.?[0-9]+)', output, flags=re.IGNORECASE)
-    if not matches:
+    match = _BRIGHT_RE.search(output)
+    if match is None:
         if output:
-            _warn_brightness_cli(f"unrecognized output: {output}")
+            message = f"unrecognized output: {output.decode(errors='replace')}"
+            _log_once(_WARNED_CLI, _CLI_FAILED_WARNING.format(message))
         return None
 
     try:
-        return max(0.0, min(1.0, float(matches[0])))
+        return _clamp01(float(match.group(1)))
     except ValueError:
-        _warn_brightness_cli(f"invalid numeric output: {matches[0]}")
+        message = f"invalid numeric output: {match.group(1).decode(errors='replace')}"
+        _log_once(_WARNED_CLI, _CLI_FAILED_WARNING.format(message))
         return None
 
 
 def _set_brightness_via_cli(level):
     """Set brightness via external brightness utility."""
-    if _BRIGHTNESS_CLI is None:
+    cli = _find_brightness_cli()
+    if cli is None:
         return False
     try:
-        result = subprocess.run(
-            [_BRIGHTNESS_CLI, f"{level:.4f}"],
-            capture_output=True,
-            text=True,
+        subprocess.check_output(
+            [cli, f"{level:.4f}"],
+            stderr=subprocess.STDOUT,
             timeout=2,
-            check=False,
         )
+    except subprocess.CalledProcessError as e:
+        output = (e.output or b"").strip()
+        _log_once(
+            _WARNED_CLI,
+            _CLI_FAILED_WARNING.format(output.decode(errors="replace") or f"exit code {e.returncode}"),
+        )
+        return False
     except Exception as e:
-        _warn_brightness_cli(str(e))
+        _log_once(_WARNED_CLI, _CLI_FAILED_WARNING.format(e))
         return False
+    return True
 
-    if result.returncode == 0:
-        return True
+def _get_battery_info_via_iokit():
+    """Read the internal battery's percentage and AC state from IOPowerSources.
+
+    Returns None when the API is unavailable, and (None, True) when it works but
+    reports no internal battery (e.g. desktop Macs), so callers need not fall back.
+    """
+    if _IOKIT is None or _CORE_FOUNDATION is None:
+        return None
+    type_key, current_key, max_key, state_key = _POWER_SOURCE_KEYS
+
+    snapshot = _IOKIT.IOPSCopyPowerSourcesInfo()
+    if not snapshot:
+        return None
+    try:
+        sources = _IOKIT.IOPSCopyPowerSourcesList(snapshot)
+        if not sources:
+            return None
+        try:
+            for index in range(_CORE_FOUNDATION.CFArrayGetCount(sources)):
+                source = _CORE_FOUNDATION.CFArrayGetValueAtIndex(sources, index)
+                description = _IOKIT.IOPSGetPowerSourceDescription(snapshot, source)
+                if not description:
+                    continue
+                source_type = _cf_string_to_str(_CORE_FOUNDATION.CFDictionaryGetValue(description, type_key))
+                if source_type != _INTERNAL_BATTERY_TYPE:
+                    continue
+                current = _cf_number_to_int(_CORE_FOUNDATION.CFDictionaryGetValue(description, current_key))
+                maximum = _cf_number_to_int(_CORE_FOUNDATION.CFDictionaryGetValue(description, max_key))
+                if current is None or not maximum:
+                    continue
+                state = _cf_string_to_str(_CORE_FOUNDATION.CFDictionaryGetValue(description, state_key))
+                return int(current * 100 / maximum), state == _AC_POWER_STATE
+        finally:
+            _CORE_FOUNDATION.CFRelease(sources)
+    finally:
+        _CORE_FOUNDATION.CFRelease(snapshot)
+    return None, True
 
-    output = f"{result.stdout}\n{result.stderr}".strip()
-    _warn_brightness_cli(output or f"exit code {result.returncode}")
-    return False
 
 def get_battery_info():
     """Get current battery percentage and charging status on macOS"""
     try:
-        result = subprocess.run(
-            ['pmset', '-g', 'batt'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        battery_info = _get_battery_info_via_iokit()
+        if battery_info is not None:
+            return battery_info
+
+        # Fall back to pmset when the IOPowerSources API is unavailable.
+        output = subprocess.check_output(['pmset', '-g', 'batt'], timeout=2)
         # Parse output like "Now drawing from 'Battery Power' -InternalBattery-0 (id=12345) 85%; discharging; 2:30 remaining"
         # or "Now drawing from 'AC Power' -InternalBattery-0 (id=12345) 85%; charging; 1:30 remaining present: true"
 
-        is_plugged_in = "'AC Power'" in result.stdout
+        is_plugged_in = b"'AC Power'" in output
 
-        battery_match = re.search(r'(\d+)%', result.stdout)
-        if battery_match:
-            return int(battery_match.group(1)), is_plugged_in
+        # Scan back from the "%;" that follows the percentage instead of running a regex.
+        end = output.find(b"%;")
+        start = end
+        while start > 0 and output[start - 1:start].isdigit():
+            start -= 1
+        if start < end:
+            return int(output[start:end]), is_plugged_in
 
         return None, is_plugged_in
     except Exception as e:
-        print(f"Error getting battery info: {e}")
+        log.error("Error getting battery info: %s", e)
         return None, False
 
+def _display_services_get():
+    """Get brightness via DisplayServices, or None on failure."""
+    display_id = _get_main_display_id()
+    if display_id == 0 or _DS_GET_BRIGHTNESS(display_id, _FLOAT_BUF) != 0:
+        return None
+    return _clamp01(_FLOAT_BUF.value)
+
+def _display_services_apply(display_id, level):
+    """Set brightness on a resolved display via DisplayServices, returning True on success."""
+    _FLOAT_BUF.value = level
+    status = _DS_SET_BRIGHTNESS(display_id, _FLOAT_BUF)
+    if status == 0:
+        return True
+    _log_once(_WARNED_DISPLAY_SERVICES_SET, _NATIVE_SET_FAILED_WARNING.format("DisplayServices", status))
+    return False
+
+def _display_services_bind():
+    """Return a DisplayServices setter bound to the current main display, or None."""
+    display_id = _get_main_display_id()
+    if display_id == 0:
+        return None
+    return functools.partial(_display_services_apply, display_id)
+
+def _display_services_set(level):
+    """Set brightness via DisplayServices, returning True on success."""
+    set_level = _display_services_bind()
+    return set_level is not None and set_level(level)
+
+def _iokit_get():
+    """Get brightness via IOKit display parameters, or None on failure."""
+    service = _get_display_service()
+    if service == 0:
+        return None
+    if _IO_GET_FLOAT(service, 0, _BRIGHTNESS_KEY, _FLOAT_BUF) != 0:
+        _invalidate_display_service()
+        return None
+    return _clamp01(_FLOAT_BUF.value)
+
+def _iokit_apply(service, level):
+    """Set brightness on a resolved display service via IOKit, returning True on success."""
+    _FLOAT_BUF.value = level
+    status = _IO_SET_FLOAT(service, 0, _BRIGHTNESS_KEY, _FLOAT_BUF)
+    if status == 0:
+        return True
+    _invalidate_display_service()
+    _log_once(_WARNED_IOKIT_SET, _NATIVE_SET_FAILED_WARNING.format("IOKit", status))
+    return False
+
+def _iokit_bind():
+    """Return an IOKit setter bound to the current display service, or None."""
+    service = _get_display_service()
+    if service == 0:
+        return None
+    return functools.partial(_iokit_apply, service)
+
+def _iokit_set(level):
+    """Set brightness via IOKit display parameters, returning True on success."""
+    set_level = _iokit_bind()
+    return set_level is not None and set_level(level)
+
+# flag: _BACKEND_* bits; describe: returns the name to log; get/set: per-call
+# getter and setter; bind: returns a setter pre-bound to the current display
+# handles for flash loops, or is None when only the per-call setter applies.
+_Backend = collections.namedtuple("_Backend", "flag describe get set bind")
+
+def _build_backends():
+    """Return the brightness backends that loaded, in preference order."""
+    backends = []
+    if _CORE_GRAPHICS is not None and _DS_GET_BRIGHTNESS is not None and _DS_SET_BRIGHTNESS is not None:
+        backends.append(_Backend(
+            _BACKEND_DISPLAY_SERVICES,
+            lambda: "DisplayServices",
+            _display_services_get,
+            _display_services_set,
+            _display_services_bind,
+        ))
+    if (
+        _CORE_GRAPHICS is not None
+        and _BRIGHTNESS_KEY is not None
+        and _IO_GET_FLOAT is not None
+        and _IO_SET_FLOAT is not None
+    ):
+        backends.append(_Backend(_BACKEND_IOKIT, lambda: "IOKit", _iokit_get, _iokit_set, _iokit_bind))
+    # The CLI forks a subprocess, so it is only tried once the native backends fail.
+    backends.append(_Backend(
+        _BACKEND_CLI,
+        lambda: f"brightness CLI ({_find_brightness_cli()})",
+        _get_brightness_via_cli,
+        _set_brightness_via_cli,
+        None,
+    ))
+    return tuple(backends)
+
+def _active_backend():
+    """Return the table entry for the backend that last succeeded, or None."""
+    flag = _STATE & _BACKEND_MASK
+    for backend in _BACKENDS:
+        if backend.flag == flag:
+            return backend
+    return None
+
+_BACKENDS = _build_backends()
+
 def get_current_brightness():
     """Get current screen brightness (0.0 to 1.0)"""
     global _LAST_BRIGHTNESS
     try:
-        brightness_cli_value = _get_brightness_via_cli()
-        if brightness_cli_value is not None:
-            _LAST_BRIGHTNESS = brightness_cli_value
-            _log_brightness_backend(f"brightness CLI ({_BRIGHTNESS_CLI})")
-            return brightness_cli_value
-
-        service = _get_display_service()
-        key = _get_brightness_key()
-        if service != 0 and key is not None and _IOKIT is not None:
-            brightness = c_float(0.0)
-            status = _IOKIT.IODisplayGetFloatParameter(service, 0, key, byref(brightness))
-            if status == 0:
-                value = max(0.0, min(1.0, float(brightness.value)))
+        for backend in _BACKENDS:
+            value = backend.get()
+            if value is not None:
                 _LAST_BRIGHTNESS = value
-                _log_brightness_backend("IOKit")
-                return value
-
-        display_id = _get_main_display_id()
-        if display_id != 0 and _DISPLAY_SERVICES is not None:
-            brightness = c_float(0.0)
-            status = _DISPLAY_SERVICES.DisplayServicesGetBrightness(display_id, byref(brightness))
-            if status == 0:
-                value = max(0.0, min(1.0, float(brightness.value)))
-                _LAST_BRIGHTNESS = value
-                _log_brightness_backend("DisplayServices")
+                _log_brightness_backend(backend.flag)
                 return value
     except Exception as e:
-        print(f"Error getting brightness: {e}")
-    if _BRIGHTNESS_CLI is not None:
+        log.error("Error getting brightness: %s", e)
+    if _find_brightness_cli() is not None:
         # Some brightness builds can set values but provide no parsable listing output.
         if _LAST_BRIGHTNESS is not None:
             return _LAST_BRIGHTNESS
         return 0.5
     if _LAST_BRIGHTNESS is not None:
         return _LAST_BRIGHTNESS
-    _warn_brightness_unavailable()
+    _log_once(_WARNED_UNAVAILABLE, _UNAVAILABLE_WARNING)
     return 0.5  # Default fallback
 
 def set_brightness(level):
-    """Set screen brightness (0.0 to 1.0)"""
+    """Set screen brightness (0.0 to 1.0), returning True when a backend applied it"""
     global _LAST_BRIGHTNESS
     try:
-        clamped_level = max(0.0, min(1.0, float(level)))
-
-        if _set_brightness_via_cli(clamped_level):
-            _LAST_BRIGHTNESS = clamped_level
-            _log_brightness_backend(f"brightness CLI ({_BRIGHTNESS_CLI})")
-            return
-
-        service = _get_display_service()
-        key = _get_brightness_key()
-        if service != 0 and key is not None and _IOKIT is not None:
-            status = _IOKIT.IODisplaySetFloatParameter(service, 0, key, c_float(clamped_level))
-            if status == 0:
+        clamped_level = _clamp01(float(level))
+        for backend in _BACKENDS:
+            if backend.set(clamped_level):
                 _LAST_BRIGHTNESS = clamped_level
-                _log_brightness_backend("IOKit")
-                return
-            print(f"Error setting brightness: IOKit returned status {status}")
+                _log_brightness_backend(backend.flag)
+                return True
+        _log_once(_WARNED_UNAVAILABLE, _UNAVAILABLE_WARNING)
+    except Exception as e:
+        log.error("Error setting brightness: %s", e)
+    return False
 
-        display_id = _get_main_display_id()
-        if display_id != 0 and _DISPLAY_SERVICES is not None:
-            status = _DISPLAY_SERVICES.DisplayServicesSetBrightness(display_id, c_float(clamped_level))
-            if status == 0:
-                _LAST_BRIGHTNESS = clamped_level
-                _log_brightness_backend("DisplayServices")
+def _select_set_backend():
+    """Resolve the brightness setter once, returning a callable that takes a level.
+
+    The callable returns True when the level was applied.
+    """
+    backend = _active_backend()
+    if backend is not None and backend.bind is not None:
+        set_level = backend.bind()
+        if set_level is not None:
+            return set_level
+    # CLI or unknown backend: keep the full fallback chain and its logging.
+    return set_brightness
+
+def _flash(level_on, level_off, duration, count, deadline=None):
+    """Toggle brightness off and back on count times using a single backend lookup.
+
+    When a monotonic deadline is given, stop before a full cycle would overrun it.
+    Sleeps shorter than one display frame are unreliable and would not be visible,
+    so durations are rounded up to one vsync interval (~16.7 ms).
+    """
+    set_level = _select_set_backend()
+
+    def apply(level):
+        # On a failed quick set, use the full fallback chain for the rest of the alert.
+        nonlocal set_level
+        global _LAST_BRIGHTNESS
+        if set_level is not set_brightness:
+            if set_level(level):
+                _LAST_BRIGHTNESS = level
                 return
-            print(f"Error setting brightness: DisplayServices returned status {status}")
+            set_level = set_brightness
+        set_brightness(level)
 
-        _warn_brightness_unavailable()
-    except Exception as e:
-        print(f"Error setting brightness: {e}")
-
-def flash_screen(duration=0.3):
-    """Flash the screen by toggling brightness"""
-    original = get_current_brightness()
-    set_brightness(0.0)
-    time.sleep(duration)
-    set_brightness(original)
-    time.sleep(duration)
-
-def quick_flash(count=2, duration=0.15):
-    """Do a few quick flashes"""
-    original = get_current_brightness()
+    half = max(duration, _MIN_FLASH_DURATION)
+    sleep = time.sleep
     for _ in range(count):
-        set_brightness(0.0)
-        time.sleep(duration)
-        set_brightness(original)
-        time.sleep(duration)
+        if deadline is not None and time.monotonic() >= deadline - half * 2:
+            break
+        apply(level_off)
+        sleep(half)
+        apply(level_on)
+        sleep(half)
+
+def flash_screen(original, duration=0.3):
+    """Flash the screen by toggling brightness off and back to original"""
+    _flash(original, 0.0, duration, 1)
+
+def quick_flash(original, count=2, duration=0.15):
+    """Do a few quick flashes, returning to original brightness after each"""
+    _flash(original, 0.0, duration, count)
+
+def get_check_interval(battery, is_plugged_in):
+    """Return seconds until the next battery check for the current power state."""
+    if is_plugged_in or battery > 50:
+        return 60
+    if battery > 10:
+        return 30
+    if battery > 2:
+        # Keeps the 3-5% alert cadence unchanged.
+        return DEFAULT_CHECK_INTERVAL
+    return 2
+
+def wait_for_power_event(timeout):
+    """Sleep up to timeout seconds, waking early when the power source changes."""
+    global _POWER_SOURCE_FD
+    if _POWER_SOURCE_FD is None:
+        time.sleep(timeout)
+        return
+    try:
+        readable, _, _ = select.select([_POWER_SOURCE_FD], [], [], timeout)
+        # Drain queued notification tokens so the next wait blocks again.
+        if readable and not os.read(_POWER_SOURCE_FD, 64):
+            _POWER_SOURCE_FD = None
+    except OSError:
+        _POWER_SOURCE_FD = None
+        time.sleep(timeout)
 
 def monitor_battery():
     """Main monitoring loop"""
-    print("Battery Monitor Started")
-    print("Monitoring battery levels...")
-    print("Press Ctrl+C to stop")
+    log.info("Battery Monitor Started")
+    log.info("Monitoring battery levels...")
+    log.info("Press Ctrl+C to stop")
 
     last_battery = None
     last_plugged_status = None
     original_brightness = None
     brightness_was_modified = False
-    check_interval = 10  # Check every 10 seconds
-    test_brightness_cutoff = get_test_brightness_cutoff()
-    test_battery_override = get_test_battery_override()
+    test_config = load_test_config()
+    test_brightness_cutoff = test_config.brightness_cutoff
     test_trigger_armed = True
 
     if test_brightness_cutoff is not None:
-        print(f"Test mode: brightness cutoff {test_brightness_cutoff:.2f} enabled (mimics 3% behavior)")
-    if test_battery_override is not None:
-        level, plugged = test_battery_override
-        power_state = "plugged in" if plugged else "on battery"
-        print(f"Test mode: simulating battery at {level}% ({power_state})")
+        log.info("Test mode: brightness cutoff %.2f enabled (mimics 3%% behavior)", test_brightness_cutoff)
+    if test_config.battery_level is not None:
+        power_state = "plugged in" if test_config.plugged else "on battery"
+        log.info("Test mode: simulating battery at %d%% (%s)", test_config.battery_level, power_state)
 
     try:
         while True:
-            battery, is_plugged_in = get_battery_info()
-            if test_battery_override is not None:
-                battery, is_plugged_in = test_battery_override
+            if test_config.battery_level is not None:
+                battery, is_plugged_in = test_config.battery_level, test_config.plugged
+            else:
+                battery, is_plugged_in = get_battery_info()
 
             if battery is None:
-                print("Unable to read battery level")
-                time.sleep(check_interval)
+                log.warning("Unable to read battery level")
+                wait_for_power_event(DEFAULT_CHECK_INTERVAL)
                 continue
 
+            check_interval = get_check_interval(battery, is_plugged_in)
+            if test_brightness_cutoff is not None:
+                check_interval = min(check_interval, DEFAULT_CHECK_INTERVAL)
+
             # Print status when battery level or plugged status changes
-            if battery != last_battery or is_plugged_in != last_plugged_status:
+            state_changed = battery != last_battery or is_plugged_in != last_plugged_status
+            if state_changed:
                 status = "plugged in" if is_plugged_in else "on battery"
-                print(f"Battery: {battery}% ({status})")
+                log.info("Battery: %d%% (%s)", battery, status)
                 last_battery = battery
                 last_plugged_status = is_plugged_in
 
-            # Save original brightness on first run
+            # Save original brightness on first run; afterwards only read it back
+            # when an alert or the test trigger can act on the value.
             if original_brightness is None:
                 original_brightness = get_current_brightness()
-
-            current_brightness = get_current_brightness()
+                current_brightness = original_brightness
+            elif test_brightness_cutoff is not None or (not is_plugged_in and battery <= 5):
+                current_brightness = get_current_brightness()
+            else:
+                current_brightness = _LAST_BRIGHTNESS
             test_triggered = (
                 test_brightness_cutoff is not None
                 and test_trigger_armed
@@ -407,71 +703,77 @@ def monitor_battery():
             # If plugged in, restore brightness if it was modified
             if is_plugged_in:
                 if brightness_was_modified:
-                    print("Device plugged in, restoring brightness")
+                    log.info("Device plugged in, restoring brightness")
                     if original_brightness:
                         set_brightness(original_brightness)
                     brightness_was_modified = False
-                time.sleep(check_interval)
+                wait_for_power_event(check_interval)
                 continue
 
             # Only apply visual effects when NOT plugged in
             if test_triggered:
-                print(
-                    f"⚠️  TEST: brightness {current_brightness:.2f} <= {test_brightness_cutoff:.2f} - "
-                    "mimicking 3% cutoff"
+                log.warning(
+                    "⚠️  TEST: brightness %.2f <= %.2f - mimicking 3%% cutoff",
+                    current_brightness,
+                    test_brightness_cutoff,
                 )
                 set_brightness(0.4)
-                quick_flash()
+                quick_flash(0.4)
                 brightness_was_modified = True
                 test_trigger_armed = False
-                time.sleep(check_interval)
+                wait_for_power_event(check_interval)
             elif battery <= 2:
                 # Continuous flashing at 2% and below
-                print(f"⚠️  CRITICAL: {battery}% battery - FLASHING SCREEN")
-                # Flash continuously during the check interval
+                # Checks repeat every 2s here, so only log the alert when the state changes.
+                log_alert = log.warning if state_changed else log.debug
+                log_alert("⚠️  CRITICAL: %d%% battery - FLASHING SCREEN", battery)
+                # Flash continuously until the check interval deadline, then sleep off
+                # whatever backend latency left over so the cadence does not drift.
                 flash_duration = 0.3
+                deadline = time.monotonic() + check_interval
                 flashes = int(check_interval / (flash_duration * 2))
-                for _ in range(flashes):
-                    flash_screen(duration=flash_duration)
+                _flash(current_brightness, 0.0, flash_duration, flashes, deadline)
                 brightness_was_modified = True
+                wait_for_power_event(max(0.0, deadline - time.monotonic()))
             elif battery == 3:
-                print("⚠️  WARNING: 3% battery - Dimming + flash alert")
+                log.warning("⚠️  WARNING: 3% battery - Dimming + flash alert")
                 set_brightness(0.4)
-                quick_flash()
+                quick_flash(0.4)
                 brightness_was_modified = True
-                time.sleep(check_interval)
+                wait_for_power_event(check_interval)
             elif battery == 4:
-                print("⚠️  WARNING: 4% battery - Slight dim + flash alert")
+                log.warning("⚠️  WARNING: 4% battery - Slight dim + flash alert")
                 set_brightness(0.6)
-                quick_flash()
+                quick_flash(0.6)
                 brightness_was_modified = True
-                time.sleep(check_interval)
+                wait_for_power_event(check_interval)
             elif battery == 5:
-                print("⚠️  LOW: 5% battery - Starting to dim + flash alert")
+                log.warning("⚠️  LOW: 5% battery - Starting to dim + flash alert")
                 set_brightness(0.8)
-                quick_flash()
+                quick_flash(0.8)
                 brightness_was_modified = True
-                time.sleep(check_interval)
+                wait_for_power_event(check_interval)
             else:
                 # Reset brightness if above threshold
                 if brightness_was_modified and battery > 5:
-                    print("Battery level recovered, restoring brightness")
+                    log.info("Battery level recovered, restoring brightness")
                     if original_brightness:
                         set_brightness(original_brightness)
                     brightness_was_modified = False
-                time.sleep(check_interval)
+                wait_for_power_event(check_interval)
 
     except KeyboardInterrupt:
-        print("\nStopping battery monitor...")
+        log.info("Stopping battery monitor...")
         # Restore brightness on exit
         if original_brightness:
-            print("Restoring original brightness...")
+            log.info("Restoring original brightness...")
             set_brightness(original_brightness)
         sys.exit(0)
 
 if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stdout, format="%(message)s")
     if platform.system() != "Darwin":
-        print("This script is designed for macOS only")
+        log.error("This script is designed for macOS only")
         sys.exit(1)
 
     monitor_battery()